@@ -0,0 +1,39 @@
+"""server_default_updated_at
+
+Revision ID: c67940a2a139
+Revises: 9a61c4b23792
+Create Date: 2026-10-15 11:52:44.381906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c67940a2a139'
+down_revision: Union[str, None] = '9a61c4b23792'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ['budget', 'debt', 'savingsgoal', 'usergoal', 'usersettings']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        op.alter_column(table, 'updated_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=sa.func.now())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.alter_column(table, 'updated_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=None)
@@ -0,0 +1,47 @@
+"""server_default_created_at
+
+Revision ID: dffe22318217
+Revises: c67940a2a139
+Create Date: 2026-10-15 13:05:17.629410
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'dffe22318217'
+down_revision: Union[str, None] = 'c67940a2a139'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ['transaction', 'budget', 'debt', 'savingsgoal', 'usergoal', 'usersettings', 'user']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        op.alter_column(table, 'created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=sa.func.now())
+    op.alter_column('user', 'updated_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=sa.func.now())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('user', 'updated_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=None)
+    for table in TABLES:
+        op.alter_column(table, 'created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=None)
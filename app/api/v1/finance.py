@@ -6,22 +6,49 @@
 - 储蓄目标
 - Dashboard 综合数据
 """
+import asyncio
+from contextlib import AsyncExitStack
 from datetime import date as DateType, datetime, timedelta
-from typing import Optional
+from typing import Any, AsyncIterator, Callable, Optional
+from cachetools import TTLCache
 from dateutil.relativedelta import relativedelta
-from fastapi import APIRouter, Depends, HTTPException, Query
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, TypeAdapter, field_validator
+from sqlalchemy import insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.engine import Result
 from sqlmodel import select, func
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.services.database.models.finance.model import (
     Transaction, Budget, Debt, SavingsGoal, UserSettings, UserGoal
 )
-from app.services.deps import get_session
+from app.services.database.models.finance.crud import get_spending_summary
+from app.services.ai.agent import FinanceAgent, get_agent
+from app.services.deps import get_db_service, get_session
 
 router = APIRouter(prefix="/finance", tags=["finance"])
 
 
+# ============== 常量 ==============
+
+# 支出分类的中文名（用于预警文案）
+CATEGORY_LABELS: dict[str, str] = {
+    "food": "餐饮", "traffic": "交通", "shopping": "购物",
+    "entertainment": "娱乐", "love": "恋爱", "family": "生活用品",
+    "health": "健康/运动", "other": "其他"
+}
+
+# 初始化时创建的默认月预算
+DEFAULT_BUDGETS: list[tuple[str, float]] = [
+    ("food", 2000), ("traffic", 500), ("shopping", 800),
+    ("entertainment", 500), ("love", 1000), ("family", 600),
+    ("health", 300), ("other", 300)
+]
+
+
 # ============== Pydantic Schemas ==============
 
 class TransactionCreate(BaseModel):
@@ -74,7 +101,12 @@ class DebtOut(BaseModel):
     interest_rate: float
     due_date: DateType | None
     is_cleared: bool
-    progress_percent: float  # 已还百分比
+    progress_percent: float  # 已还百分比（Debt.progress_percent）
+
+    @field_validator("interest_rate", mode="before")
+    @classmethod
+    def default_interest_rate(cls, value):
+        return value or 0
 
 
 class DebtPayment(BaseModel):
@@ -168,6 +200,19 @@ class DashboardOverview(BaseModel):
     daily_budget_limit: float     # 每日预算限额（可调整）
 
 
+# 列表响应的 TypeAdapter 在导入时构建好：handler 里一次校验 ORM 行并用 pydantic-core 直接输出 JSON bytes，
+# 不再经过 FastAPI 按 response_model 的逐次校验与 jsonable 转换（response_model 仍用于文档）
+TRANSACTION_LIST_ADAPTER = TypeAdapter(list[TransactionOut])
+BUDGET_LIST_ADAPTER = TypeAdapter(list[BudgetOut])
+DEBT_LIST_ADAPTER = TypeAdapter(list[DebtOut])
+
+
+def list_json_response(adapter: TypeAdapter, rows) -> Response:
+    """用预构建的 adapter 把 ORM 行列表序列化为 JSON 响应"""
+    items = adapter.validate_python(rows, from_attributes=True)
+    return Response(content=adapter.dump_json(items), media_type="application/json")
+
+
 # ============== 用户ID（临时，后续从JWT获取）  目前就我一个用户 也无所谓==============
 
 def get_current_user_id() -> int:
@@ -176,10 +221,10 @@ def get_current_user_id() -> int:
 
 # ============== 工具函数 ==============
 
-def get_remaining_months(start_date: DateType, total_months: int) -> int:
-    """计算剩余月数"""
+def get_remaining_months(start_date: DateType, total_months: int, today: DateType | None = None) -> int:
+    """计算剩余月数（today 可由调用方传入，避免重复取当前日期）"""
     end_date = start_date + relativedelta(months=total_months)
-    today = DateType.today()
+    today = today or DateType.today()
     
     if today >= end_date:
         return 1  # 至少1个月
@@ -189,9 +234,95 @@ def get_remaining_months(start_date: DateType, total_months: int) -> int:
     return max(1, total_months - months_passed)
 
 
-def get_current_month_str() -> str:
+def get_current_month_str(today: DateType | None = None) -> str:
     """获取当月字符串 YYYY-MM"""
-    return DateType.today().strftime("%Y-%m")
+    return (today or DateType.today()).strftime("%Y-%m")
+
+
+async def fetch_in_new_session(statement, fetch: Callable[[Result], Any]) -> Any:
+    """在独立会话中执行查询并取出结果（AsyncSession 不支持并发，需要并行的查询各用一个会话）"""
+    async with get_db_service().with_session() as session:
+        result = await session.execute(statement)
+        return fetch(result)
+
+
+# ============== 按用户的短期缓存 ==============
+# 目标配置和预算很少变化，但每次刷新 Dashboard 都要读：按 user_id 缓存 30 秒，对应的写接口里主动失效。
+# 缓存是进程内的，多 worker 部署时其它进程最多滞后一个 TTL
+
+goal_cache: TTLCache = TTLCache(maxsize=1024, ttl=30)     # user_id -> UserGoal
+budgets_cache: TTLCache = TTLCache(maxsize=1024, ttl=30)  # user_id -> {category: monthly_limit}
+
+
+async def cached_goal(user_id: int) -> Optional[UserGoal]:
+    """读取用户目标配置（带缓存，未配置时不缓存）"""
+    goal = goal_cache.get(user_id)
+    if goal is None:
+        goal = await fetch_in_new_session(
+            select(UserGoal).where(UserGoal.user_id == user_id),
+            lambda r: r.scalar(),
+        )
+        if goal is not None:
+            goal_cache[user_id] = goal
+    return goal
+
+
+async def cached_budgets(user_id: int) -> dict[str, float]:
+    """读取用户各分类月预算（带缓存）"""
+    budgets = budgets_cache.get(user_id)
+    if budgets is None:
+        budgets = await fetch_in_new_session(
+            select(Budget.category, Budget.monthly_limit).where(Budget.user_id == user_id),
+            lambda r: dict(r.all()),
+        )
+        budgets_cache[user_id] = budgets
+    return budgets
+
+
+def encode_transactions(partition) -> bytes:
+    """整批一次校验+序列化，去掉外层方括号，便于拼接成一个 JSON 数组"""
+    items = TRANSACTION_LIST_ADAPTER.validate_python(partition, from_attributes=True)
+    return TRANSACTION_LIST_ADAPTER.dump_json(items)[1:-1]
+
+
+async def transactions_json_response(query) -> StreamingResponse:
+    """
+    以 JSON 数组流式输出交易记录
+    服务端游标按 yield_per 分批取行，每批序列化后立即发送，不在内存里攒整个结果集。
+    响应体在请求依赖退出后才发送完，所以这里自己开会话，不用请求级的 db。
+    开会话、执行查询、取第一批都在构造响应之前完成：这些步骤出错时响应头还没发出，仍走统一的异常处理返回错误。
+    会话挂在响应的 background 上关闭，客户端中途断开时同样会执行
+    """
+    stack = AsyncExitStack()
+    try:
+        session = await stack.enter_async_context(get_db_service().with_session())
+        rows = await session.stream_scalars(query.execution_options(yield_per=100))
+        partitions = rows.partitions()
+        first_partition = await anext(partitions, None)
+        return StreamingResponse(
+            stream_transactions_json(stack, first_partition, partitions),
+            media_type="application/json",
+            background=BackgroundTask(stack.aclose),
+        )
+    except BaseException:
+        await stack.aclose()
+        raise
+
+
+async def stream_transactions_json(
+    stack: AsyncExitStack, first_partition, partitions: AsyncIterator
+) -> AsyncIterator[bytes]:
+    """输出已取到的第一批和剩余批次；中途出错时立即关闭会话（正常结束由响应的 background 关闭）"""
+    try:
+        yield b"["
+        if first_partition is not None:
+            yield encode_transactions(first_partition)
+            async for partition in partitions:
+                yield b"," + encode_transactions(partition)
+        yield b"]"
+    except Exception:
+        await stack.aclose()
+        raise
 
 
 # ============== Transaction API ==============
@@ -214,7 +345,6 @@ async def create_transaction(
     )
     db.add(tx)
     await db.commit()
-    await db.refresh(tx)
     return tx
 
 
@@ -226,10 +356,9 @@ async def list_transactions(
     type: str | None = Query(None),
     limit: int = Query(100, le=500),
     offset: int = Query(0),
-    db: AsyncSession = Depends(get_session),
     user_id: int = Depends(get_current_user_id)
 ):
-    """获取收支记录列表"""
+    """获取收支记录列表（流式输出 JSON 数组）"""
     query = select(Transaction).where(Transaction.user_id == user_id)
     
     if start_date:
@@ -244,8 +373,7 @@ async def list_transactions(
     query = query.order_by(Transaction.date.desc(), Transaction.created_at.desc())
     query = query.offset(offset).limit(limit)
     
-    result = await db.execute(query)
-    return result.scalars().all()
+    return await transactions_json_response(query)
 
 
 @router.delete("/transactions/{tx_id}", status_code=204)
@@ -281,7 +409,7 @@ async def list_budgets(
     result = await db.execute(
         select(Budget).where(Budget.user_id == user_id)
     )
-    return result.scalars().all()
+    return list_json_response(BUDGET_LIST_ADAPTER, result.scalars().all())
 
 
 @router.post("/budgets", response_model=BudgetOut)
@@ -291,28 +419,20 @@ async def set_budget(
     user_id: int = Depends(get_current_user_id)
 ):
     """设置/更新某类别预算"""
-    result = await db.execute(
-        select(Budget).where(
-            Budget.user_id == user_id,
-            Budget.category == payload.category
-        )
+    # 单条 INSERT ... ON DUPLICATE KEY UPDATE，依赖 (user_id, category) 唯一约束，一次往返且无竞态
+    stmt = mysql_insert(Budget).values(
+        user_id=user_id,
+        category=payload.category,
+        monthly_limit=payload.monthly_limit,
     )
-    budget = result.scalar()
-    
-    if budget:
-        budget.monthly_limit = payload.monthly_limit
-        budget.updated_at = datetime.utcnow()
-    else:
-        budget = Budget(
-            user_id=user_id,
-            category=payload.category,
-            monthly_limit=payload.monthly_limit,
-        )
-        db.add(budget)
-    
+    stmt = stmt.on_duplicate_key_update(
+        monthly_limit=stmt.inserted.monthly_limit,
+        updated_at=func.now(),  # ON DUPLICATE KEY UPDATE 不会触发列上的 onupdate，需显式写
+    )
+    await db.execute(stmt)
     await db.commit()
-    await db.refresh(budget)
-    return budget
+    budgets_cache.pop(user_id, None)
+    return BudgetOut(category=payload.category, monthly_limit=payload.monthly_limit)
 
 
 # ============== Debt API ==============
@@ -326,21 +446,7 @@ async def list_debts(
     result = await db.execute(
         select(Debt).where(Debt.user_id == user_id).order_by(Debt.created_at.desc())
     )
-    debts = result.scalars().all()
-    
-    return [
-        DebtOut(
-            id=d.id,
-            name=d.name,
-            total_amount=d.total_amount,
-            remaining_amount=d.remaining_amount,
-            interest_rate=d.interest_rate or 0,
-            due_date=d.due_date,
-            is_cleared=d.is_cleared,
-            progress_percent=round(((d.total_amount - d.remaining_amount) / d.total_amount) * 100, 1) if d.total_amount > 0 else 0
-        )
-        for d in debts
-    ]
+    return list_json_response(DEBT_LIST_ADAPTER, result.scalars().all())
 
 
 @router.post("/debts", response_model=DebtOut)
@@ -360,18 +466,7 @@ async def create_debt(
     )
     db.add(debt)
     await db.commit()
-    await db.refresh(debt)
-    
-    return DebtOut(
-        id=debt.id,
-        name=debt.name,
-        total_amount=debt.total_amount,
-        remaining_amount=debt.remaining_amount,
-        interest_rate=debt.interest_rate or 0,
-        due_date=debt.due_date,
-        is_cleared=debt.is_cleared,
-        progress_percent=0
-    )
+    return debt
 
 
 @router.put("/debts/{debt_id}/pay", response_model=DebtOut)
@@ -391,21 +486,9 @@ async def pay_debt(
     
     debt.remaining_amount = max(0, debt.remaining_amount - payload.amount)
     debt.is_cleared = debt.remaining_amount == 0
-    debt.updated_at = datetime.utcnow()
     
     await db.commit()
-    await db.refresh(debt)
-    
-    return DebtOut(
-        id=debt.id,
-        name=debt.name,
-        total_amount=debt.total_amount,
-        remaining_amount=debt.remaining_amount,
-        interest_rate=debt.interest_rate or 0,
-        due_date=debt.due_date,
-        is_cleared=debt.is_cleared,
-        progress_percent=round(((debt.total_amount - debt.remaining_amount) / debt.total_amount) * 100, 1) if debt.total_amount > 0 else 0
-    )
+    return debt
 
 
 @router.delete("/debts/{debt_id}", status_code=204)
@@ -453,33 +536,17 @@ async def create_user_goal(
     user_id: int = Depends(get_current_user_id)
 ):
     """创建/更新用户目标配置"""
-    result = await db.execute(
-        select(UserGoal).where(UserGoal.user_id == user_id)
+    # user_id 上有唯一约束，存在即更新，一条语句完成
+    values = payload.model_dump()
+    stmt = mysql_insert(UserGoal).values(user_id=user_id, **values)
+    stmt = stmt.on_duplicate_key_update(
+        updated_at=func.now(),
+        **{key: stmt.inserted[key] for key in values},
     )
-    goal = result.scalar()
-    
-    if goal:
-        # 更新
-        goal.start_date = payload.start_date
-        goal.total_months = payload.total_months
-        goal.savings_target = payload.savings_target
-        goal.initial_savings = payload.initial_savings
-        goal.current_savings = payload.current_savings
-        goal.initial_total_debt = payload.initial_total_debt
-        goal.daily_budget_limit = payload.daily_budget_limit
-        goal.monthly_income = payload.monthly_income
-        goal.updated_at = datetime.utcnow()
-    else:
-        # 创建
-        goal = UserGoal(
-            user_id=user_id,
-            **payload.model_dump()
-        )
-        db.add(goal)
-    
+    await db.execute(stmt)
     await db.commit()
-    await db.refresh(goal)
-    return goal
+    goal_cache.pop(user_id, None)
+    return UserGoalOut(**values)
 
 
 @router.put("/goal", response_model=UserGoalOut)
@@ -504,9 +571,8 @@ async def update_user_goal(
     if payload.monthly_income is not None:
         goal.monthly_income = payload.monthly_income
     
-    goal.updated_at = datetime.utcnow()
     await db.commit()
-    await db.refresh(goal)
+    goal_cache.pop(user_id, None)
     return goal
 
 
@@ -514,86 +580,89 @@ async def update_user_goal(
 
 @router.get("/dashboard", response_model=DashboardOverview)
 async def get_dashboard(
-    db: AsyncSession = Depends(get_session),
     user_id: int = Depends(get_current_user_id)
 ):
     """获取 Dashboard 综合数据（所有计算在这里完成）"""
     
-    # 1. 获取用户目标配置
-    goal_result = await db.execute(
-        select(UserGoal).where(UserGoal.user_id == user_id)
-    )
-    goal = goal_result.scalar()
-    
-    if not goal:
-        raise HTTPException(status_code=404, detail="请先初始化目标配置 POST /api/v1/finance/goal")
-    
-    # 2. 获取所有债务
-    debts_result = await db.execute(
-        select(Debt).where(Debt.user_id == user_id)
-    )
-    debts = debts_result.scalars().all()
-    
-    # 3. 获取预算设置
-    budgets_result = await db.execute(
-        select(Budget).where(Budget.user_id == user_id)
-    )
-    budgets_list = budgets_result.scalars().all()
-    budgets = {b.category: b.monthly_limit for b in budgets_list}
-    
-    # 4. 获取今日交易
     today = DateType.today()
-    today_tx_result = await db.execute(
-        select(Transaction).where(
-            Transaction.user_id == user_id,
-            Transaction.date == today
-        ).order_by(Transaction.created_at.desc())
-    )
-    today_transactions = today_tx_result.scalars().all()
-    
-    # 5. 获取本月交易
     month_start = today.replace(day=1)
     month_end = (month_start + relativedelta(months=1)) - timedelta(days=1)
-    month_tx_result = await db.execute(
-        select(Transaction).where(
-            Transaction.user_id == user_id,
-            Transaction.date >= month_start,
-            Transaction.date <= month_end
-        )
-    )
-    month_transactions = month_tx_result.scalars().all()
     
-    # 6. 获取所有交易（用于计算当前储蓄）
-    all_tx_result = await db.execute(
-        select(Transaction).where(Transaction.user_id == user_id)
+    # 各查询互不依赖，并行执行：延迟取决于最慢的一条而不是总和
+    (
+        goal,                # 1. 用户目标配置
+        debts,               # 2. 所有债务（用于返回列表）
+        current_total_debt,  # 2b. 未还清债务总额（数据库求和）
+        budgets,             # 3. 预算设置
+        today_transactions,  # 4. 今日交易
+        month_rows,          # 5. 本月按 (类型, 分类) 汇总（数据库聚合）
+        totals,              # 6. 历史收支汇总（用于计算当前储蓄）
+    ) = await asyncio.gather(
+        cached_goal(user_id),
+        fetch_in_new_session(
+            select(Debt).where(Debt.user_id == user_id),
+            lambda r: r.scalars().all(),
+        ),
+        fetch_in_new_session(
+            select(func.sum(Debt.remaining_amount)).where(
+                Debt.user_id == user_id,
+                Debt.is_cleared.is_(False)
+            ),
+            lambda r: r.scalar() or 0,
+        ),
+        cached_budgets(user_id),
+        fetch_in_new_session(
+            select(Transaction).where(
+                Transaction.user_id == user_id,
+                Transaction.date == today
+            ).order_by(Transaction.created_at.desc()),
+            lambda r: r.scalars().all(),
+        ),
+        fetch_in_new_session(
+            select(Transaction.type, Transaction.category, func.sum(Transaction.amount)).where(
+                Transaction.user_id == user_id,
+                Transaction.date >= month_start,
+                Transaction.date <= month_end
+            ).group_by(Transaction.type, Transaction.category),
+            lambda r: r.all(),
+        ),
+        fetch_in_new_session(
+            select(Transaction.type, func.sum(Transaction.amount)).where(
+                Transaction.user_id == user_id
+            ).group_by(Transaction.type),
+            lambda r: {t: s or 0 for t, s in r.all()},
+        ),
     )
-    all_transactions = all_tx_result.scalars().all()
+    
+    if not goal:
+        raise HTTPException(status_code=404, detail="请先初始化目标配置 POST /api/v1/finance/goal")
     
     # ============== 计算逻辑 ==============
     
-    # 今日数据
+    # 今日数据（今日明细本身要返回，直接在已取出的行上求和）
     today_expense = sum(t.amount for t in today_transactions if t.type == "expense")
     today_remaining = goal.daily_budget_limit - today_expense
     
-    # 本月数据
-    monthly_income = sum(t.amount for t in month_transactions if t.type == "income")
-    monthly_expense = sum(t.amount for t in month_transactions if t.type == "expense")
-    monthly_balance = monthly_income - monthly_expense
-    
-    # 本月分类支出
+    # 本月数据：一次遍历分组结果，同时得到收入、支出和分类支出
+    monthly_income = 0
+    monthly_expense = 0
     by_category = {}
-    for t in month_transactions:
-        if t.type == "expense":
-            by_category[t.category] = by_category.get(t.category, 0) + t.amount
+    for tx_type, category, amount in month_rows:
+        amount = amount or 0
+        if tx_type == "income":
+            monthly_income += amount
+        elif tx_type == "expense":
+            monthly_expense += amount
+            by_category[category] = amount
+    monthly_balance = monthly_income - monthly_expense
     
-    # 债务计算
-    current_total_debt = sum(d.remaining_amount for d in debts if not d.is_cleared)
+    # 债务计算（current_total_debt 已由数据库求和）
     paid_debt = goal.initial_total_debt - current_total_debt
     
     # ============== 储蓄动态计算 ==============
     # 当前储蓄 = 初始储蓄 + 总收入 - 总支出 - 已还债务
-    total_income = sum(t.amount for t in all_transactions if t.type == "income")
-    total_expense = sum(t.amount for t in all_transactions if t.type == "expense")
+    total_income = totals.get("income", 0)
+    total_expense = totals.get("expense", 0)
     current_savings = goal.initial_savings + total_income - total_expense - paid_debt
     savings_growth = current_savings - goal.initial_savings
     
@@ -611,7 +680,7 @@ async def get_dashboard(
     progress_percent = round((current_progress / total_target) * 100, 1) if total_target > 0 else 0
     
     # 剩余月数
-    remaining_months = get_remaining_months(goal.start_date, goal.total_months)
+    remaining_months = get_remaining_months(goal.start_date, goal.total_months, today=today)
     
     # 月度目标
     monthly_target = round(remaining / remaining_months) if remaining_months > 0 else 0
@@ -634,11 +703,6 @@ async def get_dashboard(
         ))
     
     # 分类预算超支
-    category_labels = {
-        "food": "餐饮", "traffic": "交通", "shopping": "购物",
-        "entertainment": "娱乐", "love": "恋爱", "family": "生活用品",
-        "health": "健康/运动", "other": "其他"
-    }
     for cat, spent in by_category.items():
         limit = budgets.get(cat, 0)
         if limit > 0:
@@ -646,31 +710,17 @@ async def get_dashboard(
                 alerts.append(AlertItem(
                     type="error",
                     category="category_budget",
-                    message=f"{category_labels.get(cat, cat)}已超预算 ¥{spent - limit:.0f}"
+                    message=f"{CATEGORY_LABELS.get(cat, cat)}已超预算 ¥{spent - limit:.0f}"
                 ))
             elif spent > limit * 0.8:
                 alerts.append(AlertItem(
                     type="warning",
                     category="category_budget",
-                    message=f"{category_labels.get(cat, cat)}预算已用 {int(spent / limit * 100)}%"
+                    message=f"{CATEGORY_LABELS.get(cat, cat)}预算已用 {int(spent / limit * 100)}%"
                 ))
     
     # ============== 组装返回数据 ==============
     
-    debts_out = [
-        DebtOut(
-            id=d.id,
-            name=d.name,
-            total_amount=d.total_amount,
-            remaining_amount=d.remaining_amount,
-            interest_rate=d.interest_rate or 0,
-            due_date=d.due_date,
-            is_cleared=d.is_cleared,
-            progress_percent=round(((d.total_amount - d.remaining_amount) / d.total_amount) * 100, 1) if d.total_amount > 0 else 0
-        )
-        for d in debts
-    ]
-    
     today_tx_out = [
         TransactionOut(
             id=t.id,
@@ -685,7 +735,8 @@ async def get_dashboard(
         for t in today_transactions
     ]
     
-    return DashboardOverview(
+    year_month = get_current_month_str(today)
+    overview = DashboardOverview(
         yearly_goal=YearlyGoalData(
             total_target=total_target,
             current_progress=current_progress,
@@ -704,7 +755,7 @@ async def get_dashboard(
             transactions=today_tx_out
         ),
         monthly=MonthlyData(
-            year_month=today.strftime("%Y-%m"),
+            year_month=year_month,
             income=monthly_income,
             expense=monthly_expense,
             balance=monthly_balance,
@@ -719,13 +770,17 @@ async def get_dashboard(
             net_worth=current_savings - current_total_debt,  # 净资产也用动态储蓄
             net_worth_target=goal.savings_target
         ),
-        debts=debts_out,
+        debts=debts,  # DebtOut 开启了 from_attributes，直接读 ORM 对象
         total_debt=current_total_debt,
         budgets=budgets,
         budget_usage=by_category,
         alerts=alerts,
         daily_budget_limit=goal.daily_budget_limit
     )
+    
+    # 模型已在上面构造并校验过，直接用 pydantic-core 序列化，
+    # 跳过 FastAPI 按 response_model 再校验/转换一遍（response_model 仍用于文档）
+    return Response(content=overview.model_dump_json(), media_type="application/json")
 
 
 # ============== 初始化数据接口 ==============
@@ -749,7 +804,7 @@ async def initialize_data(
     # 创建目标配置
     goal = UserGoal(
         user_id=user_id,
-        start_date=date(2025, 11, 28),
+        start_date=DateType(2025, 11, 28),
         total_months=12,
         savings_target=50000,
         initial_savings=11150,
@@ -760,26 +815,27 @@ async def initialize_data(
     )
     db.add(goal)
     
+    # 债务、预算用 Core insert 批量写入（executemany），每张表一次往返，不走 ORM 的对象跟踪
+    
     # 创建初始债务
-    debts = [
-        Debt(user_id=user_id, name="抖音", total_amount=6000, remaining_amount=6000),
-        Debt(user_id=user_id, name="京东", total_amount=15000, remaining_amount=15000),
-        Debt(user_id=user_id, name="美团", total_amount=800, remaining_amount=800),
+    debt_rows = [
+        {"user_id": user_id, "name": name, "total_amount": amount, "remaining_amount": amount}
+        for name, amount in [("抖音", 6000), ("京东", 15000), ("美团", 800)]
     ]
-    for d in debts:
-        db.add(d)
+    await db.execute(insert(Debt), debt_rows)
     
     # 创建默认预算
-    default_budgets = [
-        ("food", 2000), ("traffic", 500), ("shopping", 800),
-        ("entertainment", 500), ("love", 1000), ("family", 600),
-        ("health", 300), ("other", 300)
+    budget_rows = [
+        {"user_id": user_id, "category": cat, "monthly_limit": limit}
+        for cat, limit in DEFAULT_BUDGETS
     ]
-    for cat, limit in default_budgets:
-        budget = Budget(user_id=user_id, category=cat, monthly_limit=limit)
-        db.add(budget)
+    # 用户可能在初始化前已经 POST /budgets 设过某些分类：已存在的 (user_id, category) 保留原值，不因唯一约束报错
+    budget_stmt = mysql_insert(Budget)
+    await db.execute(budget_stmt.on_duplicate_key_update(monthly_limit=Budget.monthly_limit), budget_rows)
     
     await db.commit()
+    goal_cache.pop(user_id, None)
+    budgets_cache.pop(user_id, None)
     
     return {"message": "初始化成功", "user_id": user_id}
 
@@ -815,16 +871,14 @@ class ClassifyResponse(BaseModel):
 async def classify_transaction(
     payload: ClassifyRequest,
     db: AsyncSession = Depends(get_session),
-    user_id: int = Depends(get_current_user_id)
+    user_id: int = Depends(get_current_user_id),
+    agent: FinanceAgent = Depends(get_agent)
 ):
     """
     AI 智能分类
     根据消费描述自动推测分类
     如果是拿铁因子，还会返回本周/本月统计
     """
-    from app.services.ai.agent import get_agent
-    
-    agent = get_agent()
     result = await agent.classify(
         description=payload.description,
         amount=payload.amount,
@@ -917,47 +971,28 @@ class InsightResponse(BaseModel):
 async def get_spending_insight(
     payload: InsightRequest,
     db: AsyncSession = Depends(get_session),
-    user_id: int = Depends(get_current_user_id)
+    user_id: int = Depends(get_current_user_id),
+    agent: FinanceAgent = Depends(get_agent)
 ):
     """
     AI 消费洞察
     分析消费数据，给出智能建议
     """
-    from app.services.ai.agent import get_agent
-    
     # 获取本月交易数据
     today = DateType.today()
     month_start = today.replace(day=1)
     
-    result = await db.execute(
-        select(Transaction).where(
-            Transaction.user_id == user_id,
-            Transaction.date >= month_start
-        )
-    )
-    transactions = result.scalars().all()
-    
-    # 转换为字典列表
-    tx_list = [
-        {
-            "name": t.name,
-            "amount": t.amount,
-            "type": t.type,
-            "category": t.category,
-            "date": str(t.date)
-        }
-        for t in transactions
-    ]
+    # 在数据库里按 (类型, 分类) 汇总，只把汇总行交给 AI
+    summary_rows = await get_spending_summary(db, user_id, month_start)
     
-    if not tx_list:
+    if not summary_rows:
         return InsightResponse(
             summary="本月暂无消费记录",
             warnings=[],
             suggestions=["开始记录第一笔消费吧！"]
         )
     
-    agent = get_agent()
-    insight = await agent.analyze_spending(tx_list, payload.period)
+    insight = await agent.analyze_spending(summary_rows, payload.period)
     
     if insight is None:
         return InsightResponse(
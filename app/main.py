@@ -1,22 +1,55 @@
+import re
 from contextlib import asynccontextmanager
 from http import HTTPStatus
 from typing import AsyncGenerator, TypedDict
-from urllib.parse import urlencode
 
 import httpx
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi_pagination import add_pagination
 from loguru import logger
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from app.api import router
+from app.services.ai.agent import HTTP_LIMITS, HTTP_TIMEOUT, FinanceAgent
 from app.services.util import teardown_services
 
 
 class State(TypedDict):
     http_client: httpx.AsyncClient
+    finance_agent: FinanceAgent
+
+
+QUERY_VALUE_SEPARATOR = re.compile(rb",|%2[cC]")  # 逗号（含 URL 编码形式）
+
+
+def flatten_query_string(query_string: bytes) -> bytes:
+    """ids=1,2 -> ids=1&ids=2，直接处理原始字节，不解码再 urlencode"""
+    pairs: list[bytes] = []
+    for pair in query_string.split(b"&"):
+        key, sep, value = pair.partition(b"=")
+        if not sep:
+            pairs.append(pair)
+            continue
+        pairs.extend(key + b"=" + entry for entry in QUERY_VALUE_SEPARATOR.split(value))
+    return b"&".join(pairs)
+
+
+class FlattenQueryStringMiddleware:
+    """把逗号分隔的查询参数拆成重复参数；纯 ASGI 实现，没有逗号的请求直接放行"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            query_string: bytes = scope["query_string"]
+            if QUERY_VALUE_SEPARATOR.search(query_string):
+                scope["query_string"] = flatten_query_string(query_string)
+        await self.app(scope, receive, send)
 
 
 def get_lifespan():
@@ -24,8 +57,13 @@ def get_lifespan():
     async def lifespan(_app: FastAPI) -> AsyncGenerator[State, None]:
         try:
             logger.info("app start running")
-            async with httpx.AsyncClient() as http_client:
-                yield {"http_client": http_client}
+            # 每个 worker 在自己的事件循环里建一个连接池和 Agent，请求通过 request.state 取用
+            async with httpx.AsyncClient(http2=True, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS) as http_client:
+                finance_agent = FinanceAgent(http_client=http_client)
+                try:
+                    yield {"http_client": http_client, "finance_agent": finance_agent}
+                finally:
+                    await finance_agent.aclose()
         except Exception as exc:
             logger.exception(exc)
             raise
@@ -40,10 +78,13 @@ def create_app() -> FastAPI:
     app = FastAPI(
         title="fastapi-ai-starter",
         lifespan=get_lifespan(),
+        default_response_class=ORJSONResponse,
     )
 
     origins = ["*"]
 
+    # 交易列表、AI 分析等 JSON 响应压缩后再发出；太小的响应不值得压
+    app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=5)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=origins,
@@ -55,24 +96,16 @@ def create_app() -> FastAPI:
     @app.exception_handler(Exception)
     async def exception_handler(_request: Request, exc: Exception):
         if isinstance(exc, HTTPException):
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=exc.status_code,
                 content={"message": str(exc.detail)},
             )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=HTTPStatus.INTERNAL_SERVER_ERROR,
             content={"message": str(exc)},
         )
 
-    @app.middleware("http")
-    async def flatten_query_string_lists(request: Request, call_next):
-        flattened: list[tuple[str, str]] = []
-        for key, value in request.query_params.items():
-            flattened.extend((key, entry) for entry in value.split(","))
-
-        request.scope["query_string"] = urlencode(flattened, doseq=True).encode("utf-8")
-
-        return await call_next(request)
+    app.add_middleware(FlattenQueryStringMiddleware)
 
     app.include_router(router)
 
@@ -2,11 +2,19 @@
 财务 AI Agent 服务
 使用 DeepSeek API 进行智能分类和消费分析
 """
-import json
+import asyncio
 import os
 from typing import Optional
+import httpx
+import orjson
+from cachetools import TTLCache
+from fastapi import Request
 from pydantic import BaseModel
 from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletionSystemMessageParam
+
+from app.logging import logger
+from app.services.ai.rules import match_rule
 
 
 # ================= 配置 =================
@@ -16,6 +24,23 @@ DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "sk-d0323888535b4436aae5ebc4c0c
 DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com") #  我们在这里接通deepseek的api
 
 
+# 分类微批：凑满 BATCH_SIZE 笔或等待 BATCH_WINDOW 秒后合并为一次调用
+CLASSIFY_BATCH_SIZE = 16
+CLASSIFY_BATCH_WINDOW = 0.03
+CLASSIFY_MAX_CONCURRENCY = 4  # 同时在途的分类 API 调用数
+
+# 分类结果缓存
+CLASSIFY_CACHE_SIZE = 10_000
+CLASSIFY_CACHE_TTL = 24 * 3600  # 秒
+
+# 洞察摘要里最多保留的分类数（按金额排序），避免分类过多时撑大提示词
+INSIGHT_TOP_CATEGORIES = 20
+
+# 到 DeepSeek 的连接池（lifespan 里按这组参数创建 httpx 客户端）：复用 TCP/TLS 连接，HTTP/2 下多个请求复用同一条连接
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=50, max_connections=100, keepalive_expiry=60)
+
+
 # ================= 数据模型 =================
 
 class ClassifyResult(BaseModel):
@@ -114,17 +139,49 @@ INSIGHT_SYSTEM_PROMPT = """你是一个专业的财务分析师，正在帮助
 }
 """
 
+# 系统消息在导入时构建一次；固定放在 messages 开头，前缀稳定，DeepSeek 的上下文缓存（自动开启）可命中
+_CLASSIFY_SYS_MSG: ChatCompletionSystemMessageParam = {"role": "system", "content": CLASSIFY_SYSTEM_PROMPT}
+_INSIGHT_SYS_MSG: ChatCompletionSystemMessageParam = {"role": "system", "content": INSIGHT_SYSTEM_PROMPT}
+
 
 # ================= Agent 类 =================
 
 class FinanceAgent:
     """财务 AI Agent"""
     
-    def __init__(self, api_key: str = None, base_url: str = None):
+    def __init__(
+        self,
+        api_key: str = None,
+        base_url: str = None,
+        batch_size: int = CLASSIFY_BATCH_SIZE,
+        batch_window: float = CLASSIFY_BATCH_WINDOW,
+        max_concurrency: int = CLASSIFY_MAX_CONCURRENCY,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
         self.client = AsyncOpenAI(
             api_key=api_key or DEEPSEEK_API_KEY,
-            base_url=base_url or DEEPSEEK_BASE_URL
+            base_url=base_url or DEEPSEEK_BASE_URL,
+            http_client=http_client,
         )
+        # 分类请求的微批调度：classify() 只负责入队并等待结果，后台任务按批合并成一次 API 调用
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self._semaphore = asyncio.Semaphore(max_concurrency)  # 同时在途的 API 调用上限
+        self._queue: asyncio.Queue[tuple] = asyncio.Queue()  # 3.10+ 的 Queue 不在构造时绑定事件循环
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._batch_tasks: set[asyncio.Task] = set()
+        # 精确匹配缓存：(类型, 归一化描述, 金额) -> ClassifyResult，重复记账不再请求 API
+        self._classify_cache: TTLCache = TTLCache(maxsize=CLASSIFY_CACHE_SIZE, ttl=CLASSIFY_CACHE_TTL)
+    
+    async def aclose(self) -> None:
+        """停止后台调度；仍在执行的批次被取消，其 finally 会唤醒等待方。HTTP 客户端由创建方负责关闭"""
+        tasks = [*self._batch_tasks]
+        if self._dispatcher is not None:
+            tasks.append(self._dispatcher)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatcher = None
     
     async def classify(
         self, 
@@ -134,6 +191,8 @@ class FinanceAgent:
     ) -> Optional[ClassifyResult]:
         """
         智能分类消费/收入
+        先查本地关键词规则，命中则不请求 API；
+        相同描述+金额的结果会被缓存；未命中时并发到达的请求在 batch_window 内合并，一次 API 调用分类多笔
         
         Args:
             description: 消费描述，如 "美团外卖 麦当劳"
@@ -143,53 +202,216 @@ class FinanceAgent:
         Returns:
             ClassifyResult 或 None（如果失败）
         """
+        normalized = " ".join(description.split()).lower()
+        rule_data = match_rule(normalized, amount, tx_type)
+        if rule_data is not None:
+            return self._to_classify_result(rule_data, amount)
+        
+        cache_key = (tx_type, normalized, round(amount, 2))
+        cached = self._classify_cache.get(cache_key)
+        if cached is not None:
+            return cached.model_copy()  # 调用方会改写 comment，不能把缓存对象本身交出去
+        
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch_batches())
+        
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((description, amount, tx_type, future))
+        result = await future
+        if result is not None:
+            self._classify_cache[cache_key] = result.model_copy()
+        return result
+    
+    async def _dispatch_batches(self) -> None:
+        """后台调度：取到第一笔后最多再等 batch_window 秒或凑满 batch_size 笔，然后整批发出"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+    
+    async def _run_batch(self, batch: list[tuple]) -> None:
+        """执行一批分类并把结果分发给各自等待的 future（无论成败都要唤醒等待方）"""
+        results: list[Optional[ClassifyResult]] = [None] * len(batch)
+        try:
+            async with self._semaphore:
+                if len(batch) == 1:
+                    description, amount, tx_type, _ = batch[0]
+                    results = [await self._classify_one(description, amount, tx_type)]
+                else:
+                    results = await self._classify_many(batch)
+        finally:
+            for (*_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+    
+    async def _classify_one(
+        self,
+        description: str,
+        amount: float,
+        tx_type: str
+    ) -> Optional[ClassifyResult]:
+        """单笔分类：JSON 模式 + 流式输出，对象一闭合就解析返回，不必等生成结束"""
+        result_text = ""
         try:
             user_message = f"类型: {tx_type}\n描述: {description}\n金额: {amount}"
             
-            response = await self.client.chat.completions.create(
+            stream = await self.client.chat.completions.create(
                 model="deepseek-chat",
                 messages=[
-                    {"role": "system", "content": CLASSIFY_SYSTEM_PROMPT},
+                    _CLASSIFY_SYS_MSG,
                     {"role": "user", "content": user_message},
                 ],
                 temperature=0.1,  # 低温度保证格式稳定
-                max_tokens=200
+                max_tokens=200,
+                response_format={"type": "json_object"},
+                stream=True
             )
             
-            print(response)
-            result_text = response.choices[0].message.content.strip()
+            data = None
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    result_text += delta
+                    if "}" in delta:  # 可能已经收全，试着解析；失败说明还没完（比如点评里带了花括号）
+                        try:
+                            data = orjson.loads(result_text)
+                            break
+                        except orjson.JSONDecodeError:
+                            pass
+            finally:
+                await stream.close()  # 提前结束时释放连接
             
-            # 清洗 Markdown 格式
-            if result_text.startswith("```"):
-                result_text = result_text.replace("```json", "").replace("```", "").strip()
-            
-            data = json.loads(result_text)
+            if data is None:
+                data = orjson.loads(result_text)
             
-            return ClassifyResult(
-                category=data.get("category", "other"),
-                amount=data.get("amount", amount),
-                is_latte=data.get("is_latte", False),
-                comment=data.get("comment", ""),
-                confidence=0.9
-            )
+            return self._to_classify_result(data, amount)
             
-        except json.JSONDecodeError as e:
-            print(f"[AI Agent] JSON 解析失败: {e}, 原始响应: {result_text}")
+        except orjson.JSONDecodeError as e:
+            logger.warning("[AI Agent] JSON 解析失败: {}, 原始响应: {}", e, result_text)
             return None
         except Exception as e:
-            print(f"[AI Agent] 分类失败: {e}")
+            logger.opt(exception=True).warning("[AI Agent] 分类失败: {}", e)
             return None
     
+    async def _classify_many(self, batch: list[tuple]) -> list[Optional[ClassifyResult]]:
+        """
+        多笔合并为一次调用：系统提示词不变，用户消息里给出带 id 的记录数组，
+        要求返回 {"results": [...]}，再按 id 对回各笔。解析失败或缺项的记录返回 None
+        """
+        items = [
+            {"id": i, "type": tx_type, "description": description, "amount": amount}
+            for i, (description, amount, tx_type, _) in enumerate(batch)
+        ]
+        try:
+            user_message = (
+                "以下是多笔记录，请对每一笔分别按上述规则处理。\n"
+                '只返回一个 JSON 对象：{"results": [...]}，results 中每项包含对应记录的 id '
+                "以及 category、amount、is_latte、comment 字段。\n"
+                f"记录: {orjson.dumps(items).decode()}"
+            )
+            
+            response = await self.client.chat.completions.create(
+                model="deepseek-chat",
+                messages=[
+                    _CLASSIFY_SYS_MSG,
+                    {"role": "user", "content": user_message},
+                ],
+                temperature=0.1,
+                max_tokens=200 * len(batch),
+                response_format={"type": "json_object"}
+            )
+            logger.bind(subsys="agent").debug(
+                "classify batch={} tokens={}", len(batch), response.usage.total_tokens if response.usage else -1
+            )
+            
+            data = orjson.loads(response.choices[0].message.content or "")
+            by_id = {
+                item.get("id"): item
+                for item in data.get("results", [])
+                if isinstance(item, dict)
+            }
+        except Exception as e:
+            logger.opt(exception=True).warning("[AI Agent] 批量分类失败: {}", e)
+            return [None] * len(batch)
+        
+        results = []
+        for i, (_, amount, _, _) in enumerate(batch):
+            item = by_id.get(i)
+            results.append(self._to_classify_result(item, amount) if item else None)
+        return results
+    
+    @staticmethod
+    def _to_classify_result(data: dict, amount: float) -> ClassifyResult:
+        """模型返回的 JSON -> ClassifyResult；字段类型都对时跳过 Pydantic 校验直接构造"""
+        category = data.get("category", "other")
+        result_amount = data.get("amount", amount)
+        is_latte = data.get("is_latte", False)
+        comment = data.get("comment", "")
+        if (
+            isinstance(category, str)
+            and isinstance(comment, str)
+            and isinstance(is_latte, bool)
+            and isinstance(result_amount, (int, float))
+            and not isinstance(result_amount, bool)
+        ):
+            return ClassifyResult.model_construct(
+                category=category,
+                amount=float(result_amount),
+                is_latte=is_latte,
+                comment=comment,
+                confidence=0.9
+            )
+        # 类型不符（如金额是字符串）时走完整校验，由 Pydantic 做宽松转换或报错
+        return ClassifyResult(
+            category=category,
+            amount=result_amount,
+            is_latte=is_latte,
+            comment=comment,
+            confidence=0.9
+        )
+    
+    @staticmethod
+    def _to_insight_result(data: dict) -> InsightResult:
+        """模型返回的 JSON -> InsightResult；字段类型都对时跳过 Pydantic 校验直接构造"""
+        summary = data.get("summary", "")
+        warnings = data.get("warnings", [])
+        suggestions = data.get("suggestions", [])
+        if (
+            isinstance(summary, str)
+            and isinstance(warnings, list)
+            and isinstance(suggestions, list)
+            and all(isinstance(item, str) for item in warnings)
+            and all(isinstance(item, str) for item in suggestions)
+        ):
+            return InsightResult.model_construct(summary=summary, warnings=warnings, suggestions=suggestions)
+        return InsightResult(summary=summary, warnings=warnings, suggestions=suggestions)
+    
     async def analyze_spending(
         self,
-        transactions: list[dict],
+        summary_rows: list[tuple[str, str, float, int]],
         period: str = "本月"
     ) -> Optional[InsightResult]:
         """
         分析消费数据，给出洞察
         
         Args:
-            transactions: 交易记录列表
+            summary_rows: 按 (类型, 分类) 汇总的行，每项为 (type, category, 金额合计, 笔数)，见 get_spending_summary
             period: 分析周期描述
         
         Returns:
@@ -197,71 +419,67 @@ class FinanceAgent:
         """
         try:
             # 构建数据摘要
-            summary_data = self._build_summary(transactions)
-            user_message = f"分析周期: {period}\n消费数据:\n{json.dumps(summary_data, ensure_ascii=False, indent=2)}"
+            summary_data = self._build_summary(summary_rows)
+            summary_json = orjson.dumps(summary_data).decode()  # 紧凑 JSON，不缩进，少占提示词 token
+            user_message = f"分析周期: {period}\n消费数据:\n{summary_json}"
             
             response = await self.client.chat.completions.create(
                 model="deepseek-chat",
                 messages=[
-                    {"role": "system", "content": INSIGHT_SYSTEM_PROMPT},
+                    _INSIGHT_SYS_MSG,
                     {"role": "user", "content": user_message},
                 ],
                 temperature=0.3,
                 max_tokens=500
             )
+            logger.bind(subsys="agent").debug(
+                "insight tokens={}", response.usage.total_tokens if response.usage else -1
+            )
             
-            result_text = response.choices[0].message.content.strip()
+            result_text = (response.choices[0].message.content or "").strip()
             
             if result_text.startswith("```"):
                 result_text = result_text.replace("```json", "").replace("```", "").strip()
             
-            data = json.loads(result_text)
+            data = orjson.loads(result_text)
             
-            return InsightResult(
-                summary=data.get("summary", ""),
-                warnings=data.get("warnings", []),
-                suggestions=data.get("suggestions", [])
-            )
+            return self._to_insight_result(data)
             
         except Exception as e:
-            print(f"[AI Agent] 分析失败: {e}")
+            logger.opt(exception=True).warning("[AI Agent] 分析失败: {}", e)
             return None
     
-    def _build_summary(self, transactions: list[dict]) -> dict:
-        """构建交易数据摘要"""
-        total_expense = 0
-        total_income = 0
-        by_category = {}
+    def _build_summary(self, rows: list[tuple[str, str, float, int]]) -> dict:
+        """由数据库按 (类型, 分类) 汇总好的行组装摘要"""
+        total_expense = 0.0
+        total_income = 0.0
+        by_category: dict[str, float] = {}
+        transaction_count = 0
         
-        for tx in transactions:
-            amount = tx.get("amount", 0)
-            category = tx.get("category", "other")
-            tx_type = tx.get("type", "expense")
-            
+        for tx_type, category, amount, count in rows:
+            amount = amount or 0
+            transaction_count += count
             if tx_type == "expense":
                 total_expense += amount
                 by_category[category] = by_category.get(category, 0) + amount
             else:
                 total_income += amount
         
+        if len(by_category) > INSIGHT_TOP_CATEGORIES:
+            top = sorted(by_category.items(), key=lambda item: abs(item[1]), reverse=True)
+            by_category = dict(top[:INSIGHT_TOP_CATEGORIES])
+        
         return {
             "total_expense": total_expense,
             "total_income": total_income,
             "balance": total_income - total_expense,
             "by_category": by_category,
-            "transaction_count": len(transactions)
+            "transaction_count": transaction_count
         }
 
 
-# ================= 单例实例 =================
-
-_agent_instance: Optional[FinanceAgent] = None
-
-
-def get_agent() -> FinanceAgent:
-    """获取 Agent 单例"""
-    global _agent_instance
-    if _agent_instance is None:
-        _agent_instance = FinanceAgent()
-    return _agent_instance
+# ================= 依赖注入 =================
 
+def get_agent(request: Request) -> FinanceAgent:
+    """FastAPI 依赖：取 lifespan 里为当前 worker 创建的 Agent"""
+    return request.state.finance_agent
@@ -0,0 +1,79 @@
+"""
+本地关键词规则
+常见商户 / 品类直接在本地判定，命中时不再请求 DeepSeek；
+只收录含义明确的关键词，描述同时命中多条规则、收入、或没给金额时都交回模型处理
+"""
+import re
+from typing import NamedTuple, Optional
+
+
+class Rule(NamedTuple):
+    category: str
+    is_latte: bool
+    keywords: tuple[str, ...]
+
+
+# 关键词按小写匹配（描述在调用前已归一化为小写）
+RULES: tuple[Rule, ...] = (
+    Rule("coffee", True, ("咖啡", "星巴克", "瑞幸", "库迪", "拿铁", "starbucks", "luckin")),
+    Rule("food", True, ("奶茶", "喜茶", "蜜雪冰城", "茶百道", "霸王茶姬", "古茗", "coco")),
+    Rule("food", False, ("外卖", "饿了么", "早餐", "早饭", "午餐", "午饭", "晚餐", "晚饭", "食堂",
+                         "麦当劳", "肯德基", "kfc", "老乡鸡")),
+    Rule("traffic", False, ("地铁", "公交", "高铁", "火车票")),
+    Rule("traffic", True, ("打车", "滴滴", "出租车", "网约车")),
+    Rule("entertainment", True, ("电影", "ktv", "盲盒", "游戏充值", "steam")),
+    Rule("family", False, ("房租", "水费", "电费", "燃气费", "物业费", "宽带")),
+    Rule("health", False, ("药店", "医院", "挂号", "体检", "健身房")),
+    Rule("AI_productivity", False, ("openai", "chatgpt", "claude", "deepseek", "cursor")),
+)
+
+
+def _compile_keywords(keywords: tuple[str, ...]) -> re.Pattern:
+    """中文关键词按子串匹配；英文关键词要求前后不是字母数字，避免 "steamed" 命中 "steam" 这类误判"""
+    parts = [
+        rf"(?<![a-z0-9]){re.escape(keyword)}(?![a-z0-9])" if keyword.isascii() else re.escape(keyword)
+        for keyword in keywords
+    ]
+    return re.compile("|".join(parts))
+
+
+# 每条规则的关键词预编译成一个正则
+RULE_PATTERNS: tuple[tuple[Rule, re.Pattern], ...] = tuple((rule, _compile_keywords(rule.keywords)) for rule in RULES)
+
+
+def build_comment(amount: float, is_latte: bool) -> str:
+    """按提示词里的金额档位生成点评：金额优先，其次看是否拿铁因子"""
+    if amount >= 500:
+        return "大额支出，务必三思！"
+    if amount > 300:
+        return "超过300了，钱包在报警"
+    if amount >= 100:
+        return "这笔花销不小哦"
+    if is_latte:
+        return "小确幸也是钱，悠着点~" if amount < 30 else "快乐有价，这笔有点贵"
+    return "省钱小能手，继续保持！" if amount < 30 else "正常开销，心里有数就好"
+
+
+def match_rule(description: str, amount: float, tx_type: str) -> Optional[dict]:
+    """
+    命中唯一一条规则时返回与模型输出同结构的 dict，否则返回 None
+
+    Args:
+        description: 已归一化（去多余空白、小写）的描述
+        amount: 金额，<= 0 时需要模型从描述里提取，不走规则
+        tx_type: 类型，只处理 "expense"
+    """
+    if tx_type != "expense" or amount <= 0:
+        return None
+
+    matched = {rule for rule, pattern in RULE_PATTERNS if pattern.search(description)}
+    if len(matched) != 1:
+        return None
+
+    rule = matched.pop()
+    return {
+        "category": rule.category,
+        "amount": amount,
+        "is_latte": rule.is_latte,
+        "comment": build_comment(amount, rule.is_latte),
+    }
@@ -0,0 +1,60 @@
+"""
+密码哈希（CPU 密集型）
+放在独立的轻量模块里，进程池用 spawn 启动子进程：子进程导入本模块和入口 main.py（以 __mp_main__ 身份），
+入口文件把应用相关的导入放在 __main__ 判断里，所以子进程不会加载 FastAPI / 数据库等依赖
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import bcrypt
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+
+password_hasher = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=1)  # Argon2id，新密码统一用它
+
+# 每个 uvicorn worker 各有一个进程池，上限取小一些，避免多 worker 时进程数按核数成倍增长
+HASH_POOL_MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+
+
+def hash_password_sync(password: str) -> str:
+    return password_hasher.hash(password)
+
+
+def verify_password_sync(plain_password: str, hashed_password: str) -> bool:
+    if hashed_password.startswith("$argon2"):
+        try:
+            return password_hasher.verify(hashed_password, plain_password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return verify_legacy_bcrypt(plain_password, hashed_password)
+
+
+def verify_legacy_bcrypt(plain_password: str, hashed_password: str) -> bool:
+    """校验迁移前的 bcrypt 哈希；直接调用 bcrypt，不经过 passlib 的方案分发"""
+    try:
+        # bcrypt 只使用前 72 字节，与原先 passlib 的截断行为一致
+        return bcrypt.checkpw(plain_password.encode()[:72], hashed_password.encode())
+    except ValueError:  # 不是合法的 bcrypt 哈希
+        return False
+
+
+def get_hash_pool() -> ProcessPoolExecutor:
+    """哈希专用进程池，首次使用时创建；不占用事件循环默认的线程池"""
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=HASH_POOL_MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),  # 不 fork 带着事件循环和连接池的父进程
+        )
+    return _hash_pool
+
+
+def shutdown_hash_pool() -> None:
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
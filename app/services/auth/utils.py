@@ -1,45 +1,115 @@
-from datetime import datetime, timedelta, timezone
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from datetime import timedelta
+from functools import lru_cache
 from typing import Annotated, Optional
 
 import jwt
-from asgiref.sync import sync_to_async
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, Security
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.services.auth.hashing import get_hash_pool, hash_password_sync, verify_password_sync
 from app.services.database.models.user import User
 from app.services.database.models.user.crud import get_user_by_id
 from app.services.deps import get_session, get_settings_service
 
 ALGORITHM = "HS256"  # 使用HS256得算法来进行加密 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_login = OAuth2PasswordBearer(tokenUrl="api/v1/login", auto_error=False)
+verified_tokens: TTLCache = TTLCache(maxsize=50_000, ttl=30)  # token -> 已校验的 payload
+verified_tokens_lock = threading.Lock()  # TTLCache 非线程安全，事件循环和工作线程都会读写
+verified_passwords: TTLCache = TTLCache(maxsize=10_000, ttl=30)  # (哈希, 口令摘要) -> 最近校验通过
 
 
-@sync_to_async
-def get_hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+# 哈希是 CPU 密集型，放到专用进程池执行：不阻塞事件循环，也不挤占默认线程池，多核并行
+async def get_hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(get_hash_pool(), hash_password_sync, password)
 
 
-@sync_to_async
-def password_verify(plain_password: str, hashed_password: str) -> bool:  # 验证密码是否
-    return pwd_context.verify(plain_password, hashed_password)
+async def password_verify(plain_password: str, hashed_password: str) -> bool:  # 验证密码是否
+    # 只缓存校验成功的结果；键里带上存储的哈希（含随机盐），改密码后旧缓存自然失效
+    cache_key = (hashed_password, hashlib.sha256(plain_password.encode()).digest())
+    if cache_key in verified_passwords:
+        return True
+    ok = await asyncio.get_running_loop().run_in_executor(
+        get_hash_pool(), verify_password_sync, plain_password, hashed_password
+    )
+    if ok:
+        verified_passwords[cache_key] = True
+    return ok
+
+
+def _b64url(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+JWT_HEADER_SEGMENT = _b64url(b'{"alg":"HS256","typ":"JWT"}')  # 与 PyJWT 生成的头部一致
+
+
+@lru_cache(maxsize=1)
+def get_jwt_secret() -> str:
+    # 密钥只从配置里取一次
+    return get_settings_service().settings.jwt_secret
+
+
+@lru_cache(maxsize=1)
+def get_jwt_signer() -> hmac.HMAC:
+    # 预先用密钥初始化好 HMAC-SHA256（内外填充块只算一次），签名时 copy() 复用
+    return hmac.new(get_jwt_secret().encode(), digestmod=hashlib.sha256)
+
+
+def sign_token(payload: dict) -> str:
+    # 按 HS256 JWT 格式签名，输出与 jwt.encode 相同；解码仍交给 PyJWT 校验
+    signing_input = JWT_HEADER_SEGMENT + b"." + _b64url(json.dumps(payload, separators=(",", ":")).encode())
+    signer = get_jwt_signer().copy()
+    signer.update(signing_input)
+    return (signing_input + b"." + _b64url(signer.digest())).decode()
 
 
 def create_access_token(data: dict, expires_delta: timedelta):
-    settings_service = get_settings_service()
-    to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + expires_delta #
-    to_encode["exp"] = expire
-    return jwt.encode(to_encode, settings_service.settings.jwt_secret, algorithm=ALGORITHM) #使用iwt得加密方式加密 
+    return sign_token({**data, "exp": int(time.time() + expires_delta.total_seconds())})
+
+
+def issue_token_pair(user_id: int, access_delta: timedelta, refresh_delta: timedelta) -> tuple[str, str]:
+    """一次签发 access + refresh：当前时间只取一次，两个令牌只在 type 和 exp 上不同"""
+    now = time.time()
+    sub = str(user_id)
+    access = sign_token({"sub": sub, "type": "access", "exp": int(now + access_delta.total_seconds())})
+    refresh = sign_token({"sub": sub, "type": "refresh", "exp": int(now + refresh_delta.total_seconds())})
+    return access, refresh
+
+
+def cached_token_payload(token: str) -> Optional[dict]:
+    """取缓存里已校验过的 payload，未命中返回 None；命中也要检查过期（与 PyJWT 一致，没有 exp 就不检查）"""
+    with verified_tokens_lock:
+        payload = verified_tokens.get(token)
+    if payload is not None and "exp" in payload and payload["exp"] <= time.time():
+        raise jwt.ExpiredSignatureError("Signature has expired")
+    return payload
+
+
+def decode_token(token: str) -> dict:
+    """校验并解码 JWT；短时间内重复出现的 token 复用上次的校验结果，跳过 HMAC 与 JSON 解析"""
+    payload = cached_token_payload(token)
+    if payload is None:
+        payload = jwt.decode(token, get_jwt_secret(), algorithms=[ALGORITHM])
+        with verified_tokens_lock:
+            verified_tokens[token] = payload
+    return payload
 
 
-@sync_to_async
-def jwt_decode(token: str) -> Optional[int]:
+async def jwt_decode(token: str) -> Optional[int]:
+    # 缓存命中直接在事件循环里返回，只有未命中时才到线程里做签名校验
     try:
-        settings_service = get_settings_service()
-        payload = jwt.decode(token, settings_service.settings.jwt_secret, algorithms=[ALGORITHM])
+        payload = cached_token_payload(token)
+        if payload is None:
+            payload = await asyncio.to_thread(decode_token, token)
         user_id = payload.get("sub")
         return int(user_id)
     except jwt.ExpiredSignatureError:
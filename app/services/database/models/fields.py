@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import func
+from sqlmodel import Field
+
+
+def created_at_field(set_in_python: bool = False) -> Any:
+    """
+    创建时间列：默认由数据库写入（server_default NOW()）
+    set_in_python=True 时插入前在 Python 侧生成：MySQL 没有 RETURNING，插入后要读 created_at 的表
+    用它可以省掉 flush 后额外的一次 SELECT
+    """
+    if set_in_python:
+        return Field(default_factory=datetime.utcnow, nullable=False, sa_column_kwargs={"server_default": func.now()})
+    return Field(default=None, nullable=False, sa_column_kwargs={"server_default": func.now()})
+
+
+def updated_at_field() -> Any:
+    """更新时间列：由数据库在插入和每次 UPDATE 时写入"""
+    return Field(default=None, nullable=False, sa_column_kwargs={"server_default": func.now(), "onupdate": func.now()})
@@ -0,0 +1,23 @@
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.services.database.models.finance.model import Transaction
+
+
+async def get_spending_summary(
+    db: AsyncSession, user_id: int, start: date, end: Optional[date] = None
+) -> list[tuple[str, str, float, int]]:
+    """按 (类型, 分类) 在数据库里汇总区间内的收支，返回 (type, category, 金额合计, 笔数)"""
+    conditions = [Transaction.user_id == user_id, Transaction.date >= start]
+    if end is not None:
+        conditions.append(Transaction.date <= end)
+    stmt = (
+        select(Transaction.type, Transaction.category, func.sum(Transaction.amount), func.count())
+        .where(*conditions)
+        .group_by(Transaction.type, Transaction.category)
+    )
+    return [tuple(row) for row in (await db.execute(stmt)).all()]
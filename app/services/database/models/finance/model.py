@@ -1,8 +1,11 @@
 from datetime import datetime
 from datetime import date as date_type
 from typing import Optional
+from sqlalchemy import Index, UniqueConstraint
 from sqlmodel import Field, SQLModel
 
+from app.services.database.models.fields import created_at_field, updated_at_field
+
 
 class UserGoal(SQLModel, table=True):
     """用户年度目标配置"""
@@ -25,12 +28,18 @@ class UserGoal(SQLModel, table=True):
     daily_budget_limit: float = Field(default=150)
     monthly_income: Optional[float] = None        # 月收入（可选）
     
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: Optional[datetime] = created_at_field()
+    updated_at: Optional[datetime] = updated_at_field()
 
 
 class Transaction(SQLModel, table=True):
     """收支记录"""
+    __table_args__ = (
+        # 列表/Dashboard 都按 user_id 过滤再按日期范围查询、排序；带上 category 供按分类汇总
+        Index("ix_tx_user_date_cat", "user_id", "date", "category"),
+        Index("ix_tx_user_cat_date", "user_id", "category", "date"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id", index=True)
     name: str = Field(max_length=100)                    # 描述：午餐、工资
@@ -39,17 +48,21 @@ class Transaction(SQLModel, table=True):
     category: str = Field(max_length=50, index=True)     # food, traffic, salary...
     date: date_type = Field(index=True)                  # 记录日期
     note: Optional[str] = Field(default=None, max_length=500)  # 备注
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: Optional[datetime] = created_at_field(set_in_python=True)  # 创建接口直接返回它，插入前生成
 
 
 class Budget(SQLModel, table=True):
     """预算设置 - 每个用户每个类别一条记录"""
+    __table_args__ = (
+        UniqueConstraint("user_id", "category", name="uq_budget_user_category"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id", index=True)
     category: str = Field(max_length=50)                 # 类别
     monthly_limit: float                                  # 月预算上限
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: Optional[datetime] = created_at_field()
+    updated_at: Optional[datetime] = updated_at_field()
 
     class Config:
         # 每个用户每个类别只有一条记录
@@ -66,8 +79,15 @@ class Debt(SQLModel, table=True):
     interest_rate: Optional[float] = Field(default=0)    # 年利率（可选）
     due_date: Optional[date_type] = None                 # 截止日期
     is_cleared: bool = Field(default=False)              # 是否已还清
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: Optional[datetime] = created_at_field()
+    updated_at: Optional[datetime] = updated_at_field()
+
+    @property
+    def progress_percent(self) -> float:
+        """已还百分比"""
+        if self.total_amount > 0:
+            return round(((self.total_amount - self.remaining_amount) / self.total_amount) * 100, 1)
+        return 0
 
 
 class SavingsGoal(SQLModel, table=True):
@@ -77,8 +97,8 @@ class SavingsGoal(SQLModel, table=True):
     target_amount: float = Field(default=50000)          # 目标金额
     current_amount: float = Field(default=0)             # 当前已存
     deadline: Optional[date_type] = None                 # 目标日期
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: Optional[datetime] = created_at_field()
+    updated_at: Optional[datetime] = updated_at_field()
 
 
 class UserSettings(SQLModel, table=True):
@@ -87,6 +107,6 @@ class UserSettings(SQLModel, table=True):
     user_id: int = Field(foreign_key="user.id", unique=True)
     daily_budget_limit: float = Field(default=150)       # 每日消费限额
     monthly_income: Optional[float] = None               # 月收入（用于计算）
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: Optional[datetime] = created_at_field()
+    updated_at: Optional[datetime] = updated_at_field()
 
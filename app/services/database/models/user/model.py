@@ -2,6 +2,8 @@ from datetime import datetime
 from typing import Optional
 from sqlmodel import Field, SQLModel
 
+from app.services.database.models.fields import created_at_field, updated_at_field
+
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     username: str = Field(index=True, nullable=False, unique=True)
@@ -10,5 +12,5 @@ class User(SQLModel, table=True):
     access_token: Optional[str] = None    # token
     refresh_token: Optional[str] = None  # refresh token
     token_expires_at: Optional[datetime] = None # token expires at
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: Optional[datetime] = created_at_field()
+    updated_at: Optional[datetime] = updated_at_field()
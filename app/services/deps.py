@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import AsyncGenerator, cast
 
 from sqlmodel.ext.asyncio.session import AsyncSession
@@ -17,7 +18,9 @@ def get_service(service_type: ServiceType, default=None):
     return service_manager.get(service_type, default)
 
 
+@lru_cache(maxsize=1)
 def get_settings_service() -> SettingsService:
+    # 配置在进程生命周期内不变；缓存后省去每次构造工厂（会扫描导入所有服务模块）和加锁查找
     from app.services.settings.factory import SettingsServiceFactory
     return cast(SettingsService, get_service(ServiceType.SETTINGS_SERVICE, SettingsServiceFactory()))
 
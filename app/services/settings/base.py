@@ -1,4 +1,4 @@
-from typing import Annotated
+from typing import Annotated, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -10,12 +10,18 @@ class Settings(BaseSettings):
     jwt_secret: Annotated[str, Field(strict=True, alias="JWT_SECRET")]
     access_expire_min: Annotated[int, Field(strict=False, alias="ACCESS_EXPIRE_MIN")]
     refresh_expire_days: Annotated[int, Field(strict=False, alias="REFRESH_EXPIRE_DAYS")]
+    # uvicorn limit_concurrency: max open connections per worker (idle keep-alive connections count too);
+    # beyond it new requests get 503. Unset (default) means no limit
+    limit_concurrency: Annotated[Optional[int], Field(strict=False, alias="LIMIT_CONCURRENCY")] = None
     db_connection_settings: dict = {
-        "pool_size": 20,  # Match the pool_size above
-        "max_overflow": 30,  # Match the max_overflow above
+        # A dashboard request fans out into 5-7 parallel sessions (one per query), so the pool
+        # is sized for that fan-out rather than one connection per request
+        "pool_size": 50,  # Connections kept open per worker
+        "max_overflow": 30,  # Extra connections allowed during bursts
         "pool_timeout": 30,  # Seconds to wait for a connection from pool
-        "pool_pre_ping": True,  # Check connection validity before using
-        "pool_recycle": 1800,  # Recycle connections after 30 minutes
+        "pool_pre_ping": False,  # Skip the per-checkout SELECT 1; stale connections are recycled instead
+        "pool_recycle": 900,  # Recycle connections after 15 minutes, well under MySQL wait_timeout
         "echo": False,  # Set to True for debugging only
+        "connect_args": {"init_command": "SET time_zone = '+00:00'"},  # NOW() defaults are stored as UTC
     }
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
@@ -17,4 +17,7 @@ async def initialize_services() -> None:
 
 async def teardown_services() -> None:
     """Teardown all the services."""
+    from app.services.auth.hashing import shutdown_hash_pool
+
+    shutdown_hash_pool()
     await service_manager.teardown()
@@ -2,7 +2,6 @@ from multiprocessing import cpu_count
 
 from app.logging.logger import configure, logger
 
-from app.main import create_app
 
 def get_number_of_workers(workers=None):
     if workers == -1 or workers is None:
@@ -12,8 +11,13 @@ def get_number_of_workers(workers=None):
 
 
 if __name__ == "__main__":
+    # 应用相关的导入放在这里：密码哈希进程池用 spawn 启动子进程，子进程会以 __mp_main__ 重新导入本文件，
+    # 放在模块顶层的话每个子进程都会加载整个 FastAPI 应用
     import uvicorn
 
+    from app.main import create_app
+    from app.services.deps import get_settings_service
+
     configure()
     app = create_app()  # ← 手动执行工厂函数，不走字符串模式
 
@@ -24,5 +28,8 @@ if __name__ == "__main__":
         # workers=get_number_of_workers(),
         log_level="error",
         reload=False,
-        loop="asyncio"
+        loop="uvloop",
+        http="httptools",
+        # 默认不限；按打开的连接数计（含空闲 keep-alive）
+        limit_concurrency=get_settings_service().settings.limit_concurrency,
     )